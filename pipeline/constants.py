@@ -1,6 +1,8 @@
+from dataclasses import dataclass
 from enum import Enum
 from pathlib import Path
-from typing import List
+from types import MappingProxyType
+from typing import Dict, Iterable, List, Mapping, Optional, Tuple, Union
 
 BASE_DATASET_PATH = Path("/Users/yasaman/Documents/PhD/figure_understanding/dataset/")
 CONSODLIATED_DATASET_PATH = BASE_DATASET_PATH / "Consolidated"
@@ -14,37 +16,26 @@ class DatasetName(Enum):
     SYNTHETIC = "Synthetic"
     CHART_QA = "ChartQA"
 
+    def get_schema(self) -> "DatasetSchema":
+        try:
+            return DATASET_SCHEMAS[self]
+        except KeyError:
+            raise ValueError(f"Invalid dataset name: {self}")
+
     def get_required_source_columns(self) -> List[str]:
-        required_columns = [
-            "q_id",
-            self.get_question_column_name(),
-            self.get_correct_answer_column(),
-            self.get_figure_id_column(),
-        ]
-        if self == DatasetName.SYNTHETIC:
-            return required_columns + ["question_type", "x_range", "y_range"]
-        elif self == DatasetName.CHART_QA:
-            return [self.get_question_column_name()]
-        raise ValueError(f"Invalid dataset name: {self}")
+        return list(self.get_schema().required_source_columns)
 
     def get_question_column_name(self):
-        if self == DatasetName.SYNTHETIC:
-            return "question"
-        elif self == DatasetName.CHART_QA:
-            return "query"
-        return "UNKNOWN"
+        return self.get_schema().question_column
 
     def get_correct_answer_column(self) -> str:
-        if self == DatasetName.SYNTHETIC:
-            return "gold_answer"
-        elif self == DatasetName.CHART_QA:
-            return "label"
+        return self.get_schema().correct_answer_column
 
     def get_figure_id_column(self) -> str:
-        if self == DatasetName.SYNTHETIC:
-            return "figure_id"
-        elif self == DatasetName.CHART_QA:
-            return "imgname"
+        return self.get_schema().figure_id_column
+
+    def get_processed_dtypes(self) -> Dict[str, str]:
+        return dict(self.get_schema().processed_dtypes)
 
 
 class DatasetSplit(Enum):
@@ -62,44 +53,29 @@ class ModelName(Enum):
     COGVLM = "CogVLM"
     PALI = "Pali"
 
+    def get_columns(self, dataset_name: DatasetName) -> "ModelColumns":
+        try:
+            return MODEL_COLUMNS[(self, dataset_name)]
+        except KeyError:
+            raise ValueError(f"No columns registered for {self} on {dataset_name}")
+
     def get_required_columns(self, dataset_name: DatasetName) -> List[str]:
+        columns = self.get_columns(dataset_name)
         required_columns = [
-            self.get_question_id_column_name(),
-            self.get_question_column_name(dataset_name),
-            self.get_model_output_column_name(dataset_name),
+            columns.question_id_column,
+            columns.question_column,
+            columns.model_output_column,
         ]
         return required_columns
 
     def get_question_id_column_name(self) -> str:
-        if self in [ModelName.GPT4, ModelName.GEMINI, ModelName.COGVLM, ModelName.PALI]:
-            return "q_id"
-        elif self == ModelName.CHART_LLAMA:
-            return "question_id"
-        return "UNKNOWN"
+        return MODEL_QUESTION_ID_COLUMNS.get(self, "UNKNOWN")
 
     def get_question_column_name(self, dataset_name: DatasetName) -> str:
-        if self in [ModelName.GPT4, ModelName.GEMINI]:
-            return "question"
-        elif self == ModelName.CHART_LLAMA:
-            return "prompt"
-        elif self in [ModelName.COGVLM, ModelName.PALI]:
-            if dataset_name == DatasetName.SYNTHETIC:
-                return "question"
-            elif dataset_name == DatasetName.CHART_QA:
-                return "query"
-        raise ValueError(f"Invalid model name: {self}")
+        return self.get_columns(dataset_name).question_column
 
     def get_model_output_column_name(self, dataset_name: DatasetName) -> str:
-        if self in [ModelName.GPT4, ModelName.GEMINI, ModelName.COGVLM]:
-            return "model_output"
-        elif self == ModelName.CHART_LLAMA:
-            return "text"
-        elif self == ModelName.PALI:
-            if dataset_name == DatasetName.SYNTHETIC:
-                return "model_answer"
-            else:
-                return "model_output"
-        raise ValueError(f"Invalid model name: {self}")
+        return self.get_columns(dataset_name).model_output_column
 
 
 ProcessedModelResultDataTypes = {
@@ -121,3 +97,139 @@ SyntheticProcessedModelResult.update(
         "y_range": "float64",
     }
 )
+
+
+#### -------- Schema registry -------- ####
+@dataclass(frozen=True)
+class DatasetSchema:
+    question_column: str
+    correct_answer_column: str
+    figure_id_column: str
+    extra_source_columns: Tuple[str, ...]
+    required_source_columns: Tuple[str, ...]
+    processed_dtypes: Mapping[str, str]
+    splits: Tuple[DatasetSplit, ...]
+
+
+@dataclass(frozen=True)
+class ModelColumns:
+    question_id_column: str
+    question_column: str
+    model_output_column: str
+
+
+DATASET_SCHEMAS: Dict[DatasetName, DatasetSchema] = {}
+SPLIT_DATASETS: Dict[DatasetSplit, DatasetName] = {}
+MODEL_COLUMNS: Dict[Tuple[ModelName, DatasetName], ModelColumns] = {}
+MODEL_QUESTION_ID_COLUMNS: Dict[ModelName, str] = {}
+
+
+def register_dataset(
+    dataset_name: DatasetName,
+    splits: Iterable[DatasetSplit],
+    question_column: str,
+    correct_answer_column: str,
+    figure_id_column: str,
+    extra_source_columns: Iterable[str] = (),
+    processed_dtypes: Mapping[str, str] = ProcessedModelResultDataTypes,
+    required_source_columns: Optional[Iterable[str]] = None,
+):
+    # Extra source columns are copied as-is into the processed results
+    extra_source_columns = tuple(extra_source_columns)
+    if required_source_columns is None:
+        required_source_columns = [
+            "q_id",
+            question_column,
+            correct_answer_column,
+            figure_id_column,
+        ] + list(extra_source_columns)
+    schema = DatasetSchema(
+        question_column=question_column,
+        correct_answer_column=correct_answer_column,
+        figure_id_column=figure_id_column,
+        extra_source_columns=extra_source_columns,
+        required_source_columns=tuple(required_source_columns),
+        processed_dtypes=MappingProxyType(dict(processed_dtypes)),
+        splits=tuple(splits),
+    )
+    DATASET_SCHEMAS[dataset_name] = schema
+    for split in schema.splits:
+        SPLIT_DATASETS[split] = dataset_name
+
+
+def register_model(
+    model_name: ModelName,
+    question_id_column: str,
+    question_column: Union[str, Mapping[DatasetName, str]],
+    model_output_column: Union[str, Mapping[DatasetName, str]],
+    datasets: Iterable[DatasetName] = tuple(DatasetName),
+):
+    # Column names can either be shared by all datasets or given per dataset
+    MODEL_QUESTION_ID_COLUMNS[model_name] = question_id_column
+    for dataset_name in datasets:
+        MODEL_COLUMNS[(model_name, dataset_name)] = ModelColumns(
+            question_id_column=question_id_column,
+            question_column=(
+                question_column
+                if isinstance(question_column, str)
+                else question_column[dataset_name]
+            ),
+            model_output_column=(
+                model_output_column
+                if isinstance(model_output_column, str)
+                else model_output_column[dataset_name]
+            ),
+        )
+
+
+register_dataset(
+    DatasetName.SYNTHETIC,
+    splits=(DatasetSplit.BAR, DatasetSplit.SCATTER, DatasetSplit.PIE),
+    question_column="question",
+    correct_answer_column="gold_answer",
+    figure_id_column="figure_id",
+    extra_source_columns=("question_type", "x_range", "y_range"),
+    processed_dtypes=SyntheticProcessedModelResult,
+)
+register_dataset(
+    DatasetName.CHART_QA,
+    splits=(DatasetSplit.ADDITIONAL, DatasetSplit.ORIGINAL),
+    question_column="query",
+    correct_answer_column="label",
+    figure_id_column="imgname",
+    required_source_columns=("query",),
+)
+
+register_model(
+    ModelName.GPT4,
+    question_id_column="q_id",
+    question_column="question",
+    model_output_column="model_output",
+)
+register_model(
+    ModelName.GEMINI,
+    question_id_column="q_id",
+    question_column="question",
+    model_output_column="model_output",
+)
+register_model(
+    ModelName.CHART_LLAMA,
+    question_id_column="question_id",
+    question_column="prompt",
+    model_output_column="text",
+)
+register_model(
+    ModelName.COGVLM,
+    question_id_column="q_id",
+    question_column={DatasetName.SYNTHETIC: "question", DatasetName.CHART_QA: "query"},
+    model_output_column="model_output",
+)
+register_model(
+    ModelName.PALI,
+    question_id_column="q_id",
+    question_column={DatasetName.SYNTHETIC: "question", DatasetName.CHART_QA: "query"},
+    model_output_column={
+        DatasetName.SYNTHETIC: "model_answer",
+        DatasetName.CHART_QA: "model_output",
+    },
+)
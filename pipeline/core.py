@@ -1,28 +1,43 @@
 from abc import ABC, abstractmethod
 from dataclasses import asdict, dataclass
 from enum import Enum
-from typing import List, Union
+from pathlib import Path
+from typing import Dict, List, Optional, Type, Union
 
 import pandas as pd
 
 from evaluation_script.pipeline.constants import (
     SEEDS,
-    DatasetName,
     DatasetSplit,
     ModelName,
-    ProcessedModelResultDataTypes,
-    SyntheticProcessedModelResult,
 )
+from evaluation_script.pipeline.jsonl import (
+    dumps_jsonl,
+    iter_jsonl,
+    read_jsonl,
+    write_jsonl,
+)
+from evaluation_script.pipeline.shared import load_questions
 from evaluation_script.pipeline.utils import (
     ask_gpt4,
     get_dataset_name,
     get_model_raw_path,
     get_processed_model_path,
-    get_question_source_path,
     is_iterable,
 )
 
 
+PROCESSORS: Dict[ModelName, Type["ModelProcessor"]] = {}
+
+
+def register_processor(model_name: ModelName):
+    def decorator(processor_class: Type["ModelProcessor"]):
+        PROCESSORS[model_name] = processor_class
+        return processor_class
+
+    return decorator
+
+
 class ModelProcessor(ABC):
     def __init__(self, model_name: ModelName):
         self.model_name = model_name
@@ -34,32 +49,32 @@ class ModelProcessor(ABC):
     def _get_raw_model_output(self, original_model_raw_output) -> str:
         return original_model_raw_output
 
-    def process_single_run(self, split: DatasetSplit, seed: int):
+    def _build_processed_df(
+        self,
+        model_raw_df: pd.DataFrame,
+        questions_df: pd.DataFrame,
+        split: DatasetSplit,
+        seed: int,
+    ) -> pd.DataFrame:
         dataset_name = get_dataset_name(split)
         model_name = self.model_name
-        dtypes = ProcessedModelResultDataTypes
-        if dataset_name == DatasetName.SYNTHETIC:
-            dtypes = SyntheticProcessedModelResult
+        dataset_schema = dataset_name.get_schema()
+        model_columns = model_name.get_columns(dataset_name)
+        dtypes = dataset_schema.processed_dtypes
         data = {column: pd.Series(dtype=typ) for column, typ in dtypes.items()}
         df = pd.DataFrame(data)
-        model_raw_path = get_model_raw_path(model_name, split, seed)
-        model_raw_df = pd.read_json(model_raw_path, lines=True)
-        question_source_path = get_question_source_path(split)
-        questions_df = pd.read_json(question_source_path, lines=True)
         df["model_name"] = [model_name.value] * len(model_raw_df)
         df["split"] = [split.value] * len(model_raw_df)
         df["seed"] = [seed] * len(model_raw_df)
-        df["question_id"] = model_raw_df[model_name.get_question_id_column_name()]
-        question_column_name = model_name.get_question_column_name(dataset_name)
-        model_column_name = model_name.get_model_output_column_name(dataset_name)
+        df["question_id"] = model_raw_df[model_columns.question_id_column]
+        question_column_name = model_columns.question_column
+        model_column_name = model_columns.model_output_column
         df["question"] = model_raw_df[question_column_name]
         df["model_raw_output"] = self._get_raw_model_output(model_raw_df[model_column_name])
-        df["correct_answer"] = questions_df[dataset_name.get_correct_answer_column()]
-        df["figure_id"] = questions_df[dataset_name.get_figure_id_column()]
-        if dataset_name == DatasetName.SYNTHETIC:
-            df["question_type"] = questions_df["question_type"]
-            df["x_range"] = questions_df["x_range"]
-            df["y_range"] = questions_df["y_range"]
+        df["correct_answer"] = questions_df[dataset_schema.correct_answer_column]
+        df["figure_id"] = questions_df[dataset_schema.figure_id_column]
+        for column in dataset_schema.extra_source_columns:
+            df[column] = questions_df[column]
         df["model_formatted_output"] = model_raw_df.apply(
             lambda row: self._format_model_output(
                 row[question_column_name],
@@ -67,11 +82,54 @@ class ModelProcessor(ABC):
             ).strip(),
             axis=1,
         )
-
+        return df
+
+    def process_single_run(
+        self,
+        split: DatasetSplit,
+        seed: int,
+        chunksize: Optional[int] = None,
+        model_raw_path: Optional[Path] = None,
+    ):
+        dataset_name = get_dataset_name(split)
+        if model_raw_path is None:
+            model_raw_path = get_model_raw_path(self.model_name, split, seed)
+        model_raw_columns = self.model_name.get_required_columns(dataset_name)
+        questions_df = load_questions(split)
         model_processed_path = get_processed_model_path(self.model_name, split, seed)
-        df.to_json(model_processed_path, orient="records", lines=True)
-
-
+        model_processed_path.parent.mkdir(parents=True, exist_ok=True)
+        if chunksize is None:
+            model_raw_df = read_jsonl(
+                model_raw_path, required_columns=model_raw_columns
+            )
+            df = self._build_processed_df(model_raw_df, questions_df, split, seed)
+            write_jsonl(df, model_processed_path)
+            return
+
+        # Questions are matched to raw outputs by position, same as above, so
+        # each chunk is paired with the same slice of the question table.
+        tmp_path = model_processed_path.with_suffix(".jsonl.tmp")
+        offset = 0
+        try:
+            with open(tmp_path, "wb") as f:
+                for model_raw_chunk in iter_jsonl(
+                    model_raw_path, chunksize, required_columns=model_raw_columns
+                ):
+                    questions_chunk = questions_df.iloc[
+                        offset : offset + len(model_raw_chunk)
+                    ].reset_index(drop=True)
+                    offset += len(model_raw_chunk)
+                    df = self._build_processed_df(
+                        model_raw_chunk, questions_chunk, split, seed
+                    )
+                    f.write(dumps_jsonl(df))
+            tmp_path.replace(model_processed_path)
+        except BaseException:
+            tmp_path.unlink(missing_ok=True)
+            raise
+
+
+@register_processor(ModelName.GPT4)
 class GPT4Processor(ModelProcessor):
     def __init__(self):
         super().__init__(model_name=ModelName.GPT4)
@@ -79,6 +137,7 @@ class GPT4Processor(ModelProcessor):
     def _format_model_output(self, question: str, model_raw_output: str) -> str:
         return model_raw_output
 
+@register_processor(ModelName.GEMINI)
 class GeminiProcessor(ModelProcessor):
     def __init__(self):
         super().__init__(model_name=ModelName.GEMINI)
@@ -86,6 +145,7 @@ class GeminiProcessor(ModelProcessor):
     def _format_model_output(self, question: str, model_raw_output: str) -> str:
         return model_raw_output
 
+@register_processor(ModelName.PALI)
 class PaliProcessor(ModelProcessor):
     def __init__(self):
         super().__init__(model_name=ModelName.PALI)
@@ -141,6 +201,7 @@ class PaliProcessor(ModelProcessor):
         return formatted_answer
 
 
+@register_processor(ModelName.COGVLM)
 class CogVLMProcessor(ModelProcessor):
     def __init__(self):
         super().__init__(model_name=ModelName.COGVLM)
@@ -178,6 +239,7 @@ class CogVLMProcessor(ModelProcessor):
         formatted_answer = ask_gpt4(prompt)
         return formatted_answer
 
+@register_processor(ModelName.CHART_LLAMA)
 class ChartLlamaProcessor(ModelProcessor):
     def __init__(self):
         super().__init__(model_name=ModelName.CHART_LLAMA)
@@ -217,15 +279,8 @@ class ChartLlamaProcessor(ModelProcessor):
 
 
 def get_processor(model_name: ModelName) -> ModelProcessor:
-    if model_name == ModelName.GPT4:
-        return GPT4Processor()
-    elif model_name == ModelName.GEMINI:
-        return GeminiProcessor()
-    elif model_name == ModelName.PALI:
-        return PaliProcessor()
-    elif model_name == ModelName.COGVLM:
-        return CogVLMProcessor()
-    elif model_name == ModelName.CHART_LLAMA:
-        return ChartLlamaProcessor()
-    raise ValueError(f"Invalid model name: {model_name}")
-
+    try:
+        processor_class = PROCESSORS[model_name]
+    except KeyError:
+        raise ValueError(f"Invalid model name: {model_name}")
+    return processor_class()
@@ -0,0 +1,105 @@
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Union
+
+import orjson
+import pandas as pd
+
+
+def _parse_lines(
+    lines: List[bytes], path: Union[str, Path], required_columns: List[str]
+) -> List[dict]:
+    records = []
+    for line in lines:
+        if not line.strip():
+            continue
+        record = orjson.loads(line)
+        if required_columns:
+            missing_columns = [c for c in required_columns if c not in record]
+            if missing_columns:
+                raise ValueError(
+                    f"Columns {missing_columns} are missing in record "
+                    f"{len(records)} of {path}!"
+                )
+        records.append(record)
+    return records
+
+
+def _to_dataframe(
+    records: List[dict],
+    required_columns: List[str],
+    dtypes: Optional[Dict[str, str]],
+) -> pd.DataFrame:
+    columns = None
+    if not records:
+        columns = list(dict.fromkeys(list(dtypes or {}) + list(required_columns)))
+    df = pd.DataFrame.from_records(records, columns=columns)
+    if dtypes:
+        df = df.astype({c: t for c, t in dtypes.items() if c in df.columns})
+    return df
+
+
+def read_jsonl(
+    path: Union[str, Path],
+    dtypes: Optional[Dict[str, str]] = None,
+    required_columns: Optional[List[str]] = None,
+) -> pd.DataFrame:
+    required_columns = required_columns or []
+    with open(path, "rb") as f:
+        records = _parse_lines(f.read().splitlines(), path, required_columns)
+    return _to_dataframe(records, required_columns, dtypes)
+
+
+def iter_jsonl(
+    path: Union[str, Path],
+    chunksize: int,
+    dtypes: Optional[Dict[str, str]] = None,
+    required_columns: Optional[List[str]] = None,
+) -> Iterator[pd.DataFrame]:
+    required_columns = required_columns or []
+    with open(path, "rb") as f:
+        lines = []
+        for line in f:
+            if not line.strip():
+                continue
+            lines.append(line)
+            if len(lines) == chunksize:
+                records = _parse_lines(lines, path, required_columns)
+                yield _to_dataframe(records, required_columns, dtypes)
+                lines = []
+        if lines:
+            records = _parse_lines(lines, path, required_columns)
+            yield _to_dataframe(records, required_columns, dtypes)
+
+
+def _default(obj):
+    # pd.NA / NaT and pandas scalars that orjson does not know about. Only
+    # scalars are checked, pd.isna on an array-like returns an array.
+    if pd.api.types.is_scalar(obj):
+        if pd.isna(obj):
+            return None
+        if hasattr(obj, "item"):
+            return obj.item()
+    raise TypeError(f"Type is not JSON serializable: {type(obj)}")
+
+
+def dumps_jsonl(df: pd.DataFrame) -> bytes:
+    return b"".join(
+        orjson.dumps(record, default=_default, option=orjson.OPT_SERIALIZE_NUMPY)
+        + b"\n"
+        for record in df.to_dict(orient="records")
+    )
+
+
+def write_jsonl(df: pd.DataFrame, path: Union[str, Path]):
+    # Serialize before touching the target, then swap it in atomically so a
+    # failure never leaves a truncated file with a fresh mtime behind
+    path = Path(path)
+    data = dumps_jsonl(df)
+    tmp_path = path.with_suffix(path.suffix + ".tmp")
+    try:
+        with open(tmp_path, "wb") as f:
+            f.write(data)
+        tmp_path.replace(path)
+    except BaseException:
+        tmp_path.unlink(missing_ok=True)
+        raise
@@ -0,0 +1,136 @@
+from pathlib import Path
+from typing import Dict, Tuple
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.ipc as ipc
+
+from evaluation_script.pipeline.constants import (
+    CONSODLIATED_DATASET_PATH,
+    DatasetName,
+    DatasetSplit,
+)
+from evaluation_script.pipeline.jsonl import read_jsonl
+from evaluation_script.pipeline.utils import (
+    aggregate_results,
+    get_dataset_name,
+    get_question_source_path,
+)
+
+SHARED_TABLES_PATH = CONSODLIATED_DATASET_PATH / "SharedTables"
+
+# Tables attached by this process, keyed by their Arrow file path. The file's
+# (st_ino, st_mtime_ns) is kept alongside so a republished table is reattached.
+_attached_tables: Dict[Path, Tuple[Tuple[int, int], pd.DataFrame]] = {}
+
+
+def get_shared_questions_path(dataset_split: DatasetSplit) -> Path:
+    return SHARED_TABLES_PATH / "SourceQuestion" / f"{dataset_split.value}.arrow"
+
+
+def get_shared_results_path(dataset_name: DatasetName) -> Path:
+    return SHARED_TABLES_PATH / "AggregatedResults" / f"{dataset_name.value}.arrow"
+
+
+def _stringify_mixed_columns(df: pd.DataFrame) -> pd.DataFrame:
+    # Arrow needs one type per column, but answers mix numbers and text
+    for column in df.columns:
+        if df[column].dtype != object:
+            continue
+        types = {type(value) for value in df[column].dropna()}
+        if len(types) > 1 and not types & {list, dict}:
+            df[column] = df[column].astype("string")
+    return df
+
+
+def publish_table(df: pd.DataFrame, path: Path) -> Path:
+    # Uncompressed Arrow IPC files can be memory-mapped and read without copying
+    df = _stringify_mixed_columns(df.copy())
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_suffix(".arrow.tmp")
+    with pa.OSFile(str(tmp_path), "wb") as sink:
+        with ipc.new_file(sink, table.schema) as writer:
+            writer.write_table(table)
+    # Atomic rename so workers never attach to a half-written file
+    tmp_path.replace(path)
+    return path
+
+
+def attach_table(path: Path) -> pd.DataFrame:
+    stat = path.stat()
+    version = (stat.st_ino, stat.st_mtime_ns)
+    cached = _attached_tables.get(path)
+    if cached is None or cached[0] != version:
+        source = pa.memory_map(str(path), "r")
+        table = ipc.open_file(source).read_all()
+        # Arrow-backed columns keep pointing into the mapped file instead of
+        # being converted to numpy/object arrays
+        df = table.to_pandas(types_mapper=pd.ArrowDtype)
+        _attached_tables[path] = (version, df)
+    # Arrow arrays are immutable, so this copy only creates new column
+    # wrappers around the same mapped buffers. Callers can add or assign
+    # columns without changing what later attaches in this process see.
+    return _attached_tables[path][1].copy()
+
+
+def read_questions(dataset_split: DatasetSplit) -> pd.DataFrame:
+    dataset_name = get_dataset_name(dataset_split)
+    dtypes = {
+        dataset_name.get_correct_answer_column(): "string",
+        dataset_name.get_figure_id_column(): "string",
+    }
+    return read_jsonl(
+        get_question_source_path(dataset_split),
+        dtypes=dtypes,
+        required_columns=dataset_name.get_required_source_columns(),
+    )
+
+
+def load_questions(dataset_split: DatasetSplit) -> pd.DataFrame:
+    # Use the shared table when it has been published from the current source
+    shared_path = get_shared_questions_path(dataset_split)
+    source_path = get_question_source_path(dataset_split)
+    try:
+        if shared_path.stat().st_mtime_ns >= source_path.stat().st_mtime_ns:
+            return attach_table(shared_path)
+    except FileNotFoundError:
+        pass
+    return read_questions(dataset_split)
+
+
+def publish_questions(dataset_split: DatasetSplit) -> Path:
+    questions_df = read_questions(dataset_split)
+    return publish_table(questions_df, get_shared_questions_path(dataset_split))
+
+
+def publish_aggregated_results(dataset_name: DatasetName) -> Path:
+    aggregated_df = aggregate_results(dataset_name)
+    return publish_table(aggregated_df, get_shared_results_path(dataset_name))
+
+
+def attach_questions(dataset_split: DatasetSplit) -> pd.DataFrame:
+    return attach_table(get_shared_questions_path(dataset_split))
+
+
+def attach_aggregated_results(dataset_name: DatasetName) -> pd.DataFrame:
+    return attach_table(get_shared_results_path(dataset_name))
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(
+        description="Publish question and result tables for worker processes."
+    )
+    parser.add_argument(
+        "--questions-only",
+        action="store_true",
+        help="Skip publishing aggregated results.",
+    )
+    args = parser.parse_args()
+    for dataset_split in DatasetSplit:
+        print(f"Published {publish_questions(dataset_split)}")
+    if not args.questions_only:
+        for dataset_name in DatasetName:
+            print(f"Published {publish_aggregated_results(dataset_name)}")
@@ -1,20 +1,40 @@
+import json
+import os
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+
+import numpy as np
 import pandas as pd
 import pytest
 
 from evaluation_script.pipeline.constants import (
+    MODEL_COLUMNS,
     SEEDS,
     DatasetName,
     DatasetSplit,
     ModelName,
     ProcessedModelResultDataTypes,
-    SyntheticProcessedModelResult,
 )
+from evaluation_script.pipeline import jsonl, shared, utils
+from evaluation_script.pipeline.core import GPT4Processor
+from evaluation_script.pipeline.jsonl import (
+    dumps_jsonl,
+    iter_jsonl,
+    read_jsonl,
+    write_jsonl,
+)
+from evaluation_script.pipeline.shared import load_questions
 from evaluation_script.pipeline.utils import (
     get_dataset_name,
     get_model_raw_path,
     get_processed_model_path,
     get_question_source_path,
 )
+from evaluation_script.pipeline.watch import (
+    RawOutputWatcher,
+    RunKey,
+    parse_model_raw_path,
+)
 
 
 @pytest.mark.parametrize("split", DatasetSplit)
@@ -39,7 +59,7 @@ def test_model_raw_path(model_name, split, seed):
 def test_vadliate_question_source(split):
     path = get_question_source_path(split)
     dataset_name = get_dataset_name(split)
-    df = pd.read_json(path, lines=True)
+    df = read_jsonl(path)
     assert len(df) > 0, f"Empty dataframe for {path}"
     assert not df["q_id"].duplicated().any(), f"Duplicate q_id in {path}!"
     required_columns = dataset_name.get_required_source_columns()
@@ -88,7 +108,7 @@ def test_validate_model_raw_results(model_name, split, seed):
                     content_1 != content_2
                 ), f"Content of {model_raw_path} and {model_raw_path_2} are identical!"
     question_source_path = get_question_source_path(split)
-    model_raw_df = pd.read_json(model_raw_path, lines=True)
+    model_raw_df = read_jsonl(model_raw_path)
     model_output_column_name = model_name.get_model_output_column_name(
         get_dataset_name(split)
     )
@@ -114,7 +134,7 @@ def test_validate_model_raw_results(model_name, split, seed):
     assert (
         not model_raw_df[q_id_column_name].duplicated().any()
     ), f"Duplicate q_id in {model_raw_path}!"
-    questions_df = pd.read_json(question_source_path, lines=True)
+    questions_df = read_jsonl(question_source_path)
     assert len(model_raw_df) == len(
         questions_df
     ), f"Number of rows in {model_raw_path} does not match {question_source_path}"
@@ -154,14 +174,10 @@ def test_validate_model_processed_results(model_name, split, seed):
     question_source_path = get_question_source_path(split)
     model_raw_path = get_model_raw_path(model_name, split, seed)
     model_proccessed_path = get_processed_model_path(model_name, split, seed)
-    questions_df = pd.read_json(question_source_path, lines=True)
-    model_raw_df = pd.read_json(model_raw_path, lines=True)
-    model_processed_df = pd.read_json(model_proccessed_path, lines=True)
-    dtypes = (
-        ProcessedModelResultDataTypes
-        if dataset_name == DatasetName.CHART_QA
-        else SyntheticProcessedModelResult
-    )
+    questions_df = read_jsonl(question_source_path)
+    model_raw_df = read_jsonl(model_raw_path)
+    model_processed_df = read_jsonl(model_proccessed_path)
+    dtypes = dataset_name.get_processed_dtypes()
     missing_columns = set(dtypes.keys()) - set(model_processed_df.columns)
     assert not missing_columns, f"Columns {missing_columns} are missing!"
 
@@ -210,3 +226,295 @@ def test_validate_model_processed_results(model_name, split, seed):
         merged_processed_raw_df[model_processed_question_column_name]
         != merged_processed_raw_df[model_raw_question_column_name]
     ).any(), "question_x and question_y do not match!"
+
+
+@pytest.fixture
+def local_dataset(tmp_path, monkeypatch):
+    monkeypatch.setattr(utils, "CONSODLIATED_DATASET_PATH", tmp_path)
+    monkeypatch.setattr(shared, "SHARED_TABLES_PATH", tmp_path / "SharedTables")
+    return tmp_path
+
+
+def write_synthetic_run(model_outputs, split=DatasetSplit.BAR, seed=0):
+    questions = [
+        {
+            "q_id": i,
+            "question": f"question {i}",
+            "gold_answer": i if i % 2 else f"ans{i}",
+            "figure_id": f"figure_{i}",
+            "question_type": "count",
+            "x_range": 10.0,
+            "y_range": 20.0,
+        }
+        for i in range(len(model_outputs))
+    ]
+    model_raw = [
+        {"q_id": i, "question": f"question {i}", "model_output": output}
+        for i, output in enumerate(model_outputs)
+    ]
+    question_source_path = get_question_source_path(split)
+    model_raw_path = get_model_raw_path(ModelName.GPT4, split, seed)
+    for path, rows in [(question_source_path, questions), (model_raw_path, model_raw)]:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text("".join(json.dumps(row) + "\n" for row in rows))
+    return model_raw_path
+
+
+@pytest.mark.parametrize("chunksize", [1, 2, 3, 10])
+def test_chunked_processing_matches_in_memory(local_dataset, chunksize):
+    split, seed = DatasetSplit.BAR, 0
+    # The first two outputs are numeric strings, so a chunk of size 2 holds
+    # only number-like values and must still be processed as text
+    model_outputs = ["1.5", "3", "three", "4%", "The answer is 5"]
+    write_synthetic_run(model_outputs, split, seed)
+    model_processed_path = get_processed_model_path(ModelName.GPT4, split, seed)
+
+    processor = GPT4Processor()
+    processor.process_single_run(split, seed)
+    in_memory_output = model_processed_path.read_bytes()
+    processor.process_single_run(split, seed, chunksize=chunksize)
+    chunked_output = model_processed_path.read_bytes()
+
+    assert chunked_output == in_memory_output
+    assert len(chunked_output.splitlines()) == len(model_outputs)
+    assert not model_processed_path.with_suffix(".jsonl.tmp").exists()
+
+
+def test_parse_model_raw_path(tmp_path):
+    root = tmp_path / "ModelRawOutput"
+    assert parse_model_raw_path(
+        root / "GPT4" / "Synthetic" / "bar" / "3.jsonl", root
+    ) == RunKey(ModelName.GPT4, DatasetSplit.BAR, 3)
+    assert parse_model_raw_path(
+        root / "Pali" / "ChartQA" / "original" / "0.jsonl", root
+    ) == RunKey(ModelName.PALI, DatasetSplit.ORIGINAL, 0)
+    for invalid_path in [
+        root / "GPT4" / "ChartQA" / "bar" / "0.jsonl",  # split of another dataset
+        root / "Unknown" / "Synthetic" / "bar" / "0.jsonl",
+        root / "GPT4" / "Synthetic" / "bar" / "first.jsonl",
+        root / "GPT4" / "Synthetic" / "bar" / "0.json",
+        root / "GPT4" / "Synthetic" / "0.jsonl",
+        tmp_path / "GPT4" / "Synthetic" / "bar" / "0.jsonl",  # outside root
+    ]:
+        assert parse_model_raw_path(invalid_path, root) is None, invalid_path
+
+
+def make_watcher(**kwargs):
+    return RawOutputWatcher(
+        root=utils.CONSODLIATED_DATASET_PATH / "ModelRawOutput", **kwargs
+    )
+
+
+def finished(exception=None):
+    future = Future()
+    if exception is None:
+        future.set_result(None)
+    else:
+        future.set_exception(exception)
+    return future
+
+
+def test_watcher_waits_for_file_to_settle(local_dataset):
+    model_raw_path = write_synthetic_run(["a", "b"])
+    run_key = RunKey(ModelName.GPT4, DatasetSplit.BAR, 0)
+    watcher = make_watcher(debounce_seconds=30)
+    assert watcher.get_ready_runs(now=0) == {}
+    assert watcher.get_ready_runs(now=29) == {}
+    # A write restarts the debounce window
+    with open(model_raw_path, "a") as f:
+        f.write(json.dumps({"q_id": 2, "question": "q", "model_output": "c"}) + "\n")
+    assert watcher.get_ready_runs(now=31) == {}
+    assert watcher.get_ready_runs(now=60) == {}
+    assert watcher.get_ready_runs(now=61) == {model_raw_path: run_key}
+
+
+def test_watcher_skips_runs_with_up_to_date_output(local_dataset):
+    model_raw_path = write_synthetic_run(["a", "b"])
+    model_processed_path = get_processed_model_path(ModelName.GPT4, DatasetSplit.BAR, 0)
+    model_processed_path.parent.mkdir(parents=True)
+    model_processed_path.write_text("")
+    raw_mtime_ns = model_raw_path.stat().st_mtime_ns
+    watcher = make_watcher(debounce_seconds=0)
+    watcher.get_ready_runs(now=0)
+
+    os.utime(model_processed_path, ns=(raw_mtime_ns + 1, raw_mtime_ns + 1))
+    assert watcher.get_ready_runs(now=1) == {}
+    os.utime(model_processed_path, ns=(raw_mtime_ns - 1, raw_mtime_ns - 1))
+    assert list(watcher.get_ready_runs(now=1)) == [model_raw_path]
+
+
+def test_watcher_reruns_file_changed_while_processing(local_dataset):
+    model_raw_path = write_synthetic_run(["a", "b"])
+    run_key = RunKey(ModelName.GPT4, DatasetSplit.BAR, 0)
+    watcher = make_watcher(debounce_seconds=0)
+    watcher.get_ready_runs(now=0)
+    submitted_mtime_ns = watcher._states[model_raw_path].mtime_ns
+    GPT4Processor().process_single_run(DatasetSplit.BAR, 0)
+    assert watcher.get_ready_runs(now=1) == {}
+
+    # The run finished after the raw file was rewritten with a new mtime
+    watcher._states[model_raw_path].mtime_ns = submitted_mtime_ns + 1
+    watcher._on_done(model_raw_path, run_key, submitted_mtime_ns, finished())
+    assert watcher._states[model_raw_path].rerun
+
+
+def test_watcher_backs_off_and_gives_up_after_max_failures(local_dataset):
+    model_raw_path = write_synthetic_run(["a", "b"])
+    run_key = RunKey(ModelName.GPT4, DatasetSplit.BAR, 0)
+    watcher = make_watcher(debounce_seconds=0, max_failures=2, retry_delay=60)
+    watcher.get_ready_runs(now=0)
+    state = watcher._states[model_raw_path]
+    mtime_ns = state.mtime_ns
+
+    watcher._on_done(model_raw_path, run_key, mtime_ns, finished(RuntimeError()))
+    assert state.failures == 1
+    assert watcher.get_ready_runs(now=state.next_attempt - 1) == {}
+    assert list(watcher.get_ready_runs(now=state.next_attempt)) == [model_raw_path]
+
+    watcher._on_done(model_raw_path, run_key, mtime_ns, finished(RuntimeError()))
+    assert state.failures == 2
+    assert watcher.get_ready_runs(now=state.next_attempt + 10**6) == {}
+
+    # A new version of the raw file gets a fresh set of attempts
+    model_raw_path.write_text(model_raw_path.read_text() + "\n")
+    watcher.get_ready_runs(now=10**7)
+    assert list(watcher.get_ready_runs(now=10**7)) == [model_raw_path]
+
+
+def test_watcher_processes_run_for_new_split(local_dataset):
+    # Nothing has been processed for this split yet, so the output
+    # directory does not exist
+    model_raw_path = write_synthetic_run(["a", "b"], split=DatasetSplit.PIE, seed=2)
+    model_processed_path = get_processed_model_path(ModelName.GPT4, DatasetSplit.PIE, 2)
+    watcher = make_watcher(debounce_seconds=0)
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        watcher.poll(executor)
+        watcher.poll(executor)
+    assert len(read_jsonl(model_processed_path)) == 2
+    assert watcher._states[model_raw_path].failures == 0
+    assert watcher.get_ready_runs(now=time.monotonic()) == {}
+
+
+def test_publish_and_attach_questions(local_dataset):
+    write_synthetic_run(["a", "b", "c"])
+    # gold_answer mixes ints and strings, which Arrow cannot store as-is
+    assert load_questions(DatasetSplit.BAR)["gold_answer"].tolist() == [
+        "ans0",
+        "1",
+        "ans2",
+    ]
+    shared_path = shared.publish_questions(DatasetSplit.BAR)
+    questions_df = shared.attach_questions(DatasetSplit.BAR)
+    assert questions_df["gold_answer"].tolist() == ["ans0", "1", "ans2"]
+    assert load_questions(DatasetSplit.BAR).equals(questions_df)
+
+    # Callers get their own frame, not the cached one
+    questions_df["extra"] = 1
+    questions_df.loc[0, "gold_answer"] = "changed"
+    reattached_df = shared.attach_table(shared_path)
+    assert "extra" not in reattached_df.columns
+    assert reattached_df["gold_answer"].tolist() == ["ans0", "1", "ans2"]
+
+    # Republishing over the same path is picked up by the next attach
+    write_synthetic_run(["a", "b", "c", "d"])
+    # The source is now newer than the shared table, so it is parsed instead
+    shared_mtime_ns = shared_path.stat().st_mtime_ns
+    os.utime(
+        get_question_source_path(DatasetSplit.BAR),
+        ns=(shared_mtime_ns + 1, shared_mtime_ns + 1),
+    )
+    assert len(load_questions(DatasetSplit.BAR)) == 4
+    shared.publish_questions(DatasetSplit.BAR)
+    assert shared.attach_table(shared_path)["gold_answer"].tolist() == [
+        "ans0",
+        "1",
+        "ans2",
+        "3",
+    ]
+
+
+def test_read_jsonl_validates_required_columns(tmp_path):
+    path = tmp_path / "rows.jsonl"
+    path.write_text('{"q_id": 0, "question": "a"}\n{"q_id": 1}\n')
+    assert len(read_jsonl(path, required_columns=["q_id"])) == 2
+    with pytest.raises(ValueError, match=r"\['question'\] are missing in record 1"):
+        read_jsonl(path, required_columns=["q_id", "question"])
+    with pytest.raises(ValueError, match="are missing"):
+        list(iter_jsonl(path, chunksize=1, required_columns=["question"]))
+
+
+def test_read_jsonl_applies_dtypes(tmp_path):
+    path = tmp_path / "rows.jsonl"
+    path.write_text(
+        '{"question_id": 0, "correct_answer": 1, "x_range": 2}\n'
+        '{"question_id": 1, "correct_answer": "yes", "x_range": 3.5}\n'
+        "\n"
+    )
+    dtypes = {"question_id": "int32", "correct_answer": "string", "x_range": "float64"}
+    df = read_jsonl(path, dtypes=dtypes)
+    assert df.dtypes.astype(str).to_dict() == {
+        column: str(pd.Series(dtype=typ).dtype) for column, typ in dtypes.items()
+    }
+    assert df["correct_answer"].tolist() == ["1", "yes"]
+    chunks = list(iter_jsonl(path, chunksize=1, dtypes=dtypes))
+    assert [len(chunk) for chunk in chunks] == [1, 1]
+    assert pd.concat(chunks, ignore_index=True).equals(df)
+
+
+def test_read_jsonl_empty_file_has_schema_columns(tmp_path):
+    path = tmp_path / "empty.jsonl"
+    path.write_text("")
+    df = read_jsonl(
+        path, dtypes=ProcessedModelResultDataTypes, required_columns=["extra"]
+    )
+    assert len(df) == 0
+    assert list(df.columns) == list(ProcessedModelResultDataTypes) + ["extra"]
+    assert df["seed"].dtype == "int32"
+    assert list(iter_jsonl(path, chunksize=10)) == []
+
+
+def test_dumps_jsonl_round_trip(tmp_path):
+    df = pd.DataFrame(
+        {
+            "int32": np.array([1, 2], dtype="int32"),
+            "float": [1.5, np.nan],
+            "string": pd.array(["a", pd.NA], dtype="string"),
+            "object": pd.Series([np.int64(3), np.float32(0.5)], dtype=object),
+            "list": [["x", "y"], []],
+        }
+    )
+    lines = dumps_jsonl(df).splitlines()
+    assert lines == [
+        b'{"int32":1,"float":1.5,"string":"a","object":3,"list":["x","y"]}',
+        b'{"int32":2,"float":null,"string":null,"object":0.5,"list":[]}',
+    ]
+    path = tmp_path / "rows.jsonl"
+    write_jsonl(df, path)
+    round_trip_df = read_jsonl(path)
+    assert round_trip_df["int32"].tolist() == [1, 2]
+    assert round_trip_df["string"].isna().tolist() == [False, True]
+    assert round_trip_df["float"].isna().tolist() == [False, True]
+    assert round_trip_df["list"].tolist() == [["x", "y"], []]
+
+
+def test_write_jsonl_keeps_previous_file_on_failure(tmp_path):
+    path = tmp_path / "rows.jsonl"
+    write_jsonl(pd.DataFrame({"a": [1]}), path)
+    # Array-likes are not serializable and must raise TypeError, not the
+    # ambiguous truth value error pd.isna would give
+    for value in [{1, 2}, pd.Series([1, 2])]:
+        with pytest.raises(TypeError):
+            write_jsonl(pd.DataFrame({"a": [value]}), path)
+    assert path.read_text() == '{"a":1}\n'
+    assert not path.with_suffix(".jsonl.tmp").exists()
+    with pytest.raises(TypeError):
+        jsonl._default(pd.Series([1, 2]))
+
+
+def test_get_columns_reports_model_and_dataset(monkeypatch):
+    monkeypatch.delitem(MODEL_COLUMNS, (ModelName.PALI, DatasetName.CHART_QA))
+    assert ModelName.PALI.get_columns(DatasetName.SYNTHETIC).model_output_column == (
+        "model_answer"
+    )
+    with pytest.raises(ValueError, match="ModelName.PALI on DatasetName.CHART_QA"):
+        ModelName.PALI.get_model_output_column_name(DatasetName.CHART_QA)
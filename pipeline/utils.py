@@ -8,19 +8,20 @@ from evaluation_script.pipeline.constants import (
     CONSODLIATED_DATASET_PATH,
     OPENAI_API_KEY_PATH,
     SEEDS,
+    SPLIT_DATASETS,
     DatasetName,
     DatasetSplit,
     ModelName,
 )
+from evaluation_script.pipeline.jsonl import read_jsonl
 from openai import OpenAI
 
 
 def get_dataset_name(dataset_split: DatasetSplit) -> DatasetName:
-    if dataset_split in [DatasetSplit.BAR, DatasetSplit.SCATTER, DatasetSplit.PIE]:
-        return DatasetName.SYNTHETIC
-    elif dataset_split in [DatasetSplit.ADDITIONAL, DatasetSplit.ORIGINAL]:
-        return DatasetName.CHART_QA
-    raise ValueError(f"Invalid dataset split: {dataset_split}")
+    try:
+        return SPLIT_DATASETS[dataset_split]
+    except KeyError:
+        raise ValueError(f"Invalid dataset split: {dataset_split}")
 
 
 def get_question_source_path(dataset_split: DatasetSplit) -> Path:
@@ -74,13 +75,18 @@ def is_iterable(obj):
 
 def aggregate_results(dataset_name: DatasetName) -> pd.DataFrame:
     all_dfs = []
+    dtypes = dataset_name.get_processed_dtypes()
     for model_name in ModelName:
         for split in DatasetSplit:
             if dataset_name != get_dataset_name(split):
                 continue
             for seed in SEEDS:
                 model_processed_path = get_processed_model_path(model_name, split, seed)
-                df = pd.read_json(model_processed_path, lines=True)
+                df = read_jsonl(
+                    model_processed_path,
+                    dtypes=dtypes,
+                    required_columns=list(dtypes),
+                )
                 all_dfs += [df]
     aggregated_df = pd.concat(all_dfs, ignore_index=True)
     return aggregated_df
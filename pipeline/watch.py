@@ -0,0 +1,205 @@
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, Optional, Tuple
+
+from evaluation_script.pipeline.constants import (
+    CONSODLIATED_DATASET_PATH,
+    DatasetName,
+    DatasetSplit,
+    ModelName,
+)
+from evaluation_script.pipeline.core import get_processor
+from evaluation_script.pipeline.utils import (
+    get_dataset_name,
+    get_processed_model_path,
+)
+
+MODEL_RAW_OUTPUT_PATH = CONSODLIATED_DATASET_PATH / "ModelRawOutput"
+
+
+@dataclass(frozen=True)
+class RunKey:
+    model_name: ModelName
+    split: DatasetSplit
+    seed: int
+
+
+@dataclass
+class FileState:
+    mtime_ns: int
+    size: int
+    stable_since: float
+    failures: int = 0
+    next_attempt: float = 0.0
+    # Set when the file changed while its run was in flight
+    rerun: bool = False
+
+
+def parse_model_raw_path(
+    path: Path, root: Path = MODEL_RAW_OUTPUT_PATH
+) -> Optional[RunKey]:
+    # Inverse of get_model_raw_path: <model>/<dataset>/<split>/<seed>.jsonl
+    try:
+        model_value, dataset_value, split_value, file_name = path.relative_to(
+            root
+        ).parts
+        model_name = ModelName(model_value)
+        dataset_name = DatasetName(dataset_value)
+        split = DatasetSplit(split_value)
+        seed = int(Path(file_name).stem)
+    except ValueError:
+        return None
+    if path.suffix != ".jsonl" or get_dataset_name(split) != dataset_name:
+        return None
+    return RunKey(model_name, split, seed)
+
+
+class RawOutputWatcher:
+    """Polls the raw output tree and processes new or changed runs.
+
+    A run is pending when its processed output is missing or older than the
+    raw file. A file is only picked up once its size and mtime have not
+    changed for ``debounce_seconds``, so files that are still being written
+    are skipped. Failed runs are retried with exponential backoff and given
+    up on after ``max_failures`` attempts, until the raw file changes again.
+    """
+
+    def __init__(
+        self,
+        root: Path = MODEL_RAW_OUTPUT_PATH,
+        poll_interval: float = 10.0,
+        debounce_seconds: float = 30.0,
+        max_workers: int = 2,
+        chunksize: Optional[int] = None,
+        max_failures: int = 3,
+        retry_delay: float = 300.0,
+    ):
+        self.root = root
+        self.poll_interval = poll_interval
+        self.debounce_seconds = debounce_seconds
+        self.max_workers = max_workers
+        self.chunksize = chunksize
+        self.max_failures = max_failures
+        self.retry_delay = retry_delay
+        self._states: Dict[Path, FileState] = {}
+        self._running: Dict[RunKey, Future] = {}
+
+    def scan(self) -> Dict[Path, Tuple[int, int]]:
+        snapshot = {}
+        for path in self.root.glob("*/*/*/*.jsonl"):
+            try:
+                stat = path.stat()
+            except FileNotFoundError:
+                continue
+            snapshot[path] = (stat.st_mtime_ns, stat.st_size)
+        return snapshot
+
+    def is_pending(self, run_key: RunKey, mtime_ns: int) -> bool:
+        model_processed_path = get_processed_model_path(
+            run_key.model_name, run_key.split, run_key.seed
+        )
+        try:
+            return model_processed_path.stat().st_mtime_ns < mtime_ns
+        except FileNotFoundError:
+            return True
+
+    def get_ready_runs(self, now: float) -> Dict[Path, RunKey]:
+        snapshot = self.scan()
+        for path in set(self._states) - set(snapshot):
+            del self._states[path]
+        ready = {}
+        for path, (mtime_ns, size) in snapshot.items():
+            state = self._states.get(path)
+            if state is None or (state.mtime_ns, state.size) != (mtime_ns, size):
+                self._states[path] = FileState(mtime_ns, size, stable_since=now)
+                continue
+            if now - state.stable_since < self.debounce_seconds:
+                continue
+            if state.failures >= self.max_failures or now < state.next_attempt:
+                continue
+            run_key = parse_model_raw_path(path, self.root)
+            if run_key is None or run_key in self._running:
+                continue
+            if state.rerun or self.is_pending(run_key, mtime_ns):
+                ready[path] = run_key
+        return ready
+
+    def _process(self, path: Path, run_key: RunKey):
+        processor = get_processor(run_key.model_name)
+        processor.process_single_run(
+            run_key.split,
+            run_key.seed,
+            chunksize=self.chunksize,
+            model_raw_path=path,
+        )
+
+    def _on_done(self, path: Path, run_key: RunKey, mtime_ns: int, future: Future):
+        self._running.pop(run_key, None)
+        state = self._states.get(path)
+        if state is None:
+            return
+        exception = future.exception()
+        if exception is None:
+            print(f"Processed {path}")
+            state.rerun = state.mtime_ns != mtime_ns
+            return
+        state.failures += 1
+        if state.failures >= self.max_failures:
+            print(
+                f"Failed to process {path} {state.failures} times, giving up "
+                f"until it changes: {exception!r}"
+            )
+            return
+        delay = self.retry_delay * 2 ** (state.failures - 1)
+        print(f"Failed to process {path}, retrying in {delay:.0f}s: {exception!r}")
+        state.next_attempt = time.monotonic() + delay
+
+    def poll(self, executor: ThreadPoolExecutor):
+        for path, run_key in self.get_ready_runs(time.monotonic()).items():
+            state = self._states[path]
+            state.rerun = False
+            future = executor.submit(self._process, path, run_key)
+            self._running[run_key] = future
+            future.add_done_callback(
+                lambda f, p=path, k=run_key, m=state.mtime_ns: self._on_done(
+                    p, k, m, f
+                )
+            )
+
+    def watch(self):
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            while True:
+                self.poll(executor)
+                time.sleep(self.poll_interval)
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(
+        description="Process new raw model outputs as they land."
+    )
+    parser.add_argument("--root", type=Path, default=MODEL_RAW_OUTPUT_PATH)
+    parser.add_argument("--poll-interval", type=float, default=10.0)
+    parser.add_argument("--debounce-seconds", type=float, default=30.0)
+    parser.add_argument("--max-workers", type=int, default=2)
+    parser.add_argument(
+        "--chunksize",
+        type=int,
+        default=None,
+        help="Process raw output files this many rows at a time.",
+    )
+    parser.add_argument("--max-failures", type=int, default=3)
+    parser.add_argument("--retry-delay", type=float, default=300.0)
+    args = parser.parse_args()
+    RawOutputWatcher(
+        root=args.root,
+        poll_interval=args.poll_interval,
+        debounce_seconds=args.debounce_seconds,
+        max_workers=args.max_workers,
+        chunksize=args.chunksize,
+        max_failures=args.max_failures,
+        retry_delay=args.retry_delay,
+    ).watch()